@@ -1,68 +1,332 @@
 #!/usr/bin/env python3
 
 import argparse
+import csv
+import math
 import re
 import yt_dlp
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from diskcache import Cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from tqdm import tqdm
 import time
+import threading
 import sys
 import os
 from datetime import datetime
 import logging
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
+logger = logging.getLogger(__name__)
+
+def setup_logging():
+    """Send log output to bandcamp_extractor.log and stderr."""
+    # Worker threads only put records on a queue; a single listener thread
+    # writes them out, so workers never wait on the stream lock. Records are
+    # formatted by the QueueHandler, so the output handlers don't need a
+    # formatter of their own.
+    log_queue = queue.Queue()
+    listener = QueueListener(
+        log_queue,
         logging.FileHandler('bandcamp_extractor.log'),
         logging.StreamHandler(sys.stderr)
-    ]
+    )
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[QueueHandler(log_queue)]
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+# Compiled once at import time; these run for every video in the playlist.
+# The host has to end right after .bandcamp.com and an optional port (so
+# bandcamp.com.example.org doesn't count), and the path stops before any
+# query string, fragment or stray &-parameters. Links are rebuilt in one
+# canonical form, so the same release always produces the same link.
+BANDCAMP_RE = re.compile(
+    r'https?://([a-z0-9-]+)\.bandcamp\.com(?::\d+)?(?![\w-]|\.[\w-])(/[^\s<>"?#&]*)?',
+    re.IGNORECASE
 )
-logger = logging.getLogger(__name__)
+BANDCAMP_RELEASE_RE = re.compile(r'/((?:track|album)/[a-z0-9_-]+)/?', re.IGNORECASE)
+# Bandcamp's own subdomains, which aren't artist pages
+NON_ARTIST_HOSTS = {'www', 'daily'}
+PLAYLIST_ID_RE = re.compile(r'list=([^&]+)')
 
-def extract_bandcamp_links(video_url: str):
-    """Extract Bandcamp links from a YouTube video description."""
-    try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True,
-            'ignoreerrors': True,
-            'skip_download': True,
-            'socket_timeout': 30,
-            'retries': 3,
+# Video titles and descriptions are cached on disk so re-runs of the same
+# playlist (or a run resumed after a failure) don't go back to YouTube
+CACHE_DIR = '.ytmeta_cache'
+CACHE_EXPIRE = 7 * 24 * 60 * 60  # 7 days
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Return the video metadata cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = Cache(CACHE_DIR)
+    return _cache
+
+# Video requests allowed per minute, shared across all worker threads, and how
+# many of them may go out back to back before the steady rate applies
+DEFAULT_RATE_LIMIT = 120
+RATE_LIMIT_BURST = 2
+
+# A video fetch through yt-dlp usually takes a few seconds. The rate limit
+# times that latency is how many fetches are in flight when running flat out;
+# any workers beyond that would only sit waiting on the rate limiter.
+EXPECTED_FETCH_SECONDS = 3
+MAX_WORKERS = 32
+
+def default_workers(rate_limit: int = DEFAULT_RATE_LIMIT):
+    """Return enough worker threads to keep up with rate_limit requests per minute."""
+    return max(1, min(MAX_WORKERS, math.ceil(rate_limit / 60 * EXPECTED_FETCH_SECONDS)))
+
+# Backoff after a rate-limited request doubles per consecutive hit, up to 2**6s
+MAX_BACKOFF_EXPONENT = 6
+RATE_LIMIT_RETRIES = 3
+
+class RateLimiter:
+    """Thread-safe token bucket allowing max_rate calls per time_period seconds.
+    
+    The bucket holds at most burst tokens and starts with that many, so
+    requests are spread evenly over the period instead of going out in one
+    rush at the start of a run.
+    """
+    
+    def __init__(self, max_rate: int, time_period: float = 60, burst: int = RATE_LIMIT_BURST):
+        if max_rate <= 0 or time_period <= 0:
+            raise ValueError("max_rate and time_period must be positive")
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self.burst = max(1, min(burst, max_rate))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._rate_limit_errors = 0
+        self._paused_until = 0.0
+    
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            # Work out the delay under the lock but sleep outside it, so other
+            # workers can still report successes and rate limits meanwhile
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    refill = (now - self._last) * self.max_rate / self.time_period
+                    self._tokens = min(self.burst, self._tokens + refill)
+                    self._last = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    delay = (1 - self._tokens) * self.time_period / self.max_rate
+            time.sleep(delay)
+    
+    def report_rate_limited(self):
+        """Pause all requests, backing off exponentially while YouTube keeps refusing them."""
+        with self._lock:
+            now = time.monotonic()
+            # Requests already in flight when a pause starts fail too; those
+            # belong to the same episode and don't lengthen the back-off again
+            if now >= self._paused_until:
+                delay = 2 ** min(self._rate_limit_errors, MAX_BACKOFF_EXPONENT)
+                self._rate_limit_errors += 1
+                self._paused_until = now + delay
+                # No tokens build up during the pause, so requests pick up again
+                # at the steady rate rather than all at once
+                self._tokens = 0.0
+                self._last = self._paused_until
+            return self._paused_until - now
+    
+    def report_success(self):
+        """Let the backoff decay again once requests go through."""
+        with self._lock:
+            if self._rate_limit_errors:
+                self._rate_limit_errors -= 1
+
+# Messages meaning YouTube is throttling us; "Sign in to confirm you're not
+# a bot" is how it usually does that now, alongside plain HTTP 429s
+RATE_LIMIT_MARKERS = ('HTTP Error 429', 'Too Many Requests', 'not a bot')
+
+def is_rate_limit_error(error: Exception):
+    """Check whether an error from yt-dlp means YouTube is rate limiting us."""
+    message = str(error)
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+# Messages YouTube gives for videos that will never be watchable; anything
+# else (throttling, network trouble, format or player errors) is retried
+PERMANENT_ERROR_MARKERS = (
+    'Video unavailable',
+    'Private video',
+    'has been removed',
+    'account associated with this video has been terminated',
+    'confirm your age',
+    'not available in your country',
+)
+
+def is_permanent_error(error: Exception):
+    """Check whether a video failed in a way that retrying won't fix."""
+    if not isinstance(error, yt_dlp.utils.DownloadError) or is_rate_limit_error(error):
+        return False
+    message = str(error)
+    return any(marker in message for marker in PERMANENT_ERROR_MARKERS)
+
+YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': True,
+    'ignoreerrors': True,
+    'skip_download': True,
+    'socket_timeout': 30,
+    'retries': 3,
+    'lazy_playlist': True,
+}
+
+# YoutubeDL isn't safe to share between threads, so each worker keeps its own.
+# Reusing it also reuses its HTTP session, so after the first video a worker's
+# requests go over an already-open keep-alive connection instead of paying for
+# a new TLS handshake each time.
+# Per-video errors are raised rather than swallowed so rate limiting can be
+# spotted and backed off from.
+_thread_local = threading.local()
+
+def get_ydl():
+    """Return this thread's YoutubeDL instance, creating it on first use."""
+    ydl = getattr(_thread_local, 'ydl', None)
+    if ydl is None:
+        ydl = _thread_local.ydl = yt_dlp.YoutubeDL({**YDL_OPTS, 'ignoreerrors': False})
+    return ydl
+
+def fetch_video_info(video_url: str, rate_limiter: RateLimiter = None):
+    """Fetch the title and description of a single video."""
+    cache = get_cache()
+    cached = cache.get(video_url)
+    if cached is not None:
+        return cached
+    
+    # Cache hits never reach YouTube, so only real requests are throttled.
+    # process=False stops after the metadata is extracted, so format selection
+    # (which we don't need) can't fail the video.
+    if not rate_limiter:
+        info = get_ydl().extract_info(video_url, download=False, process=False)
+    else:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            rate_limiter.acquire()
+            try:
+                info = get_ydl().extract_info(video_url, download=False, process=False)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == RATE_LIMIT_RETRIES:
+                    raise
+                delay = rate_limiter.report_rate_limited()
+                logger.warning("Rate limited by YouTube, backing off for %ds", delay)
+                continue
+            rate_limiter.report_success()
+            break
+    
+    if not info:
+        return None
+    
+    # Only the fields we use are stored to keep the cache small
+    result = (info.get('title'), info.get('description', ''))
+    cache.set(video_url, result, expire=CACHE_EXPIRE, tag='video')
+    return result
+
+# Flat playlist entries already tell us when a video can't be watched
+UNAVAILABLE_AVAILABILITY = {'private', 'premium_only', 'subscriber_only', 'needs_auth'}
+UNAVAILABLE_TITLES = {'[private video]', '[deleted video]', '[unavailable video]',
+                      'private video', 'deleted video'}
+
+def is_unavailable_video(video: dict):
+    """Check whether a flat playlist entry is private, deleted or otherwise unwatchable."""
+    if video.get('availability') in UNAVAILABLE_AVAILABILITY:
+        return True
+    title = (video.get('title') or '').strip().lower()
+    return title in UNAVAILABLE_TITLES
+
+def find_bandcamp_links(text: str):
+    """Return the Bandcamp links found in a block of text."""
+    # A plain substring check is far cheaper than the regex engine, and most
+    # descriptions don't mention Bandcamp at all
+    if 'bandcamp.com' not in text.lower():
+        return []
+    
+    links = []
+    for match in BANDCAMP_RE.finditer(text):
+        host = match[1].lower()
+        if host in NON_ARTIST_HOSTS:
+            continue
+        artist_url = f"https://{host}.bandcamp.com/"
+        # Punctuation ending the sentence the link sits in isn't part of it
+        path = (match[2] or '').rstrip('.,;:!)]')
+        # Track and album pages are kept as they are; any other page on an
+        # artist's site (merch, discography, ...) points back to the artist
+        release = BANDCAMP_RELEASE_RE.fullmatch(path)
+        links.append(artist_url + release[1] if release else artist_url)
+    
+    # Drop repeats while keeping the order they appear in
+    return list(dict.fromkeys(links))
+
+def extract_bandcamp_links(video: dict, rate_limiter: RateLimiter = None):
+    """Extract Bandcamp links from a playlist entry's video description."""
+    video_url = video['url']
+    title = video.get('title')
+    # Flat ('url') entries only carry a truncated description snippet, if any,
+    # so only a fully extracted entry's description can be trusted as complete
+    description = video.get('description') if video.get('_type') != 'url' else None
+    
+    # Only go back to YouTube when the playlist walk didn't already
+    # give us the full description, and never for videos we can't watch
+    if not description:
+        if is_unavailable_video(video):
+            return None
+        info = fetch_video_info(video_url, rate_limiter)
+        if not info:
+            return None
+        title, description = info
+        if not description:
+            return None
+    
+    # Look for Bandcamp links in the description
+    bandcamp_links = find_bandcamp_links(description)
+    if bandcamp_links:
+        return {
+            'video_title': title or 'Unknown Title',
+            'video_url': video_url,
+            'bandcamp_links': bandcamp_links
         }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            if not info:
-                return None
-            
-            description = info.get('description', '')
-            if not description:
-                return None
-            
-            # Look for Bandcamp links in the description
-            bandcamp_links = re.findall(r'https?://[^\s<>"]+?bandcamp\.com[^\s<>"]*', description)
-            if bandcamp_links:
-                return {
-                    'video_title': info.get('title', 'Unknown Title'),
-                    'video_url': video_url,
-                    'bandcamp_links': bandcamp_links
-                }
-    except Exception as e:
-        print(f"\nError processing {video_url}: {str(e)}", file=sys.stderr)
     return None
 
-def process_playlist(playlist_url: str, output_file: str = None, max_workers: int = 4):
+def video_key(video: dict):
+    """Return the ID a video is recorded under in the .done file."""
+    return video.get('id') or video['url']
+
+def load_done_ids(done_file: str):
+    """Load the IDs of videos finished by an earlier run."""
+    if not os.path.exists(done_file):
+        return set()
+    with open(done_file) as f:
+        return {line.strip() for line in f if line.strip()}
+
+# Number of finished videos held in memory between writes to the CSV and
+# .done files
+FLUSH_EVERY = 64
+
+def process_playlist(playlist_url: str, output_file: str = None, max_workers: int = None,
+                     rate_limit: int = DEFAULT_RATE_LIMIT):
     """Process a YouTube playlist and extract Bandcamp links."""
+    if not max_workers:
+        max_workers = default_workers(rate_limit)
+    
     # Smart default for output file if none provided
     if not output_file:
         # Extract playlist ID or use current timestamp if not possible
-        playlist_id = re.search(r'(?:list=)([^&]+)', playlist_url)
+        playlist_id = PLAYLIST_ID_RE.search(playlist_url)
         if playlist_id:
             playlist_id = playlist_id.group(1)
             output_file = f"bandcamp_links_{playlist_id}.csv"
@@ -76,74 +340,111 @@ def process_playlist(playlist_url: str, output_file: str = None, max_workers: in
     
     try:
         # Extract playlist information
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True,
-            'ignoreerrors': True,
-            'skip_download': True,
-            'socket_timeout': 30,
-            'retries': 3,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
             logger.info("Fetching playlist information...")
             playlist_info = ydl.extract_info(playlist_url, download=False)
             if not playlist_info:
                 logger.error("Could not extract playlist information")
                 return
             
-            videos = playlist_info.get('entries', [])
-            if not videos:
+            entries = playlist_info.get('entries') or []
+            if not entries:
                 logger.warning("No videos found in playlist")
                 return
             
-            total_videos = len(videos)
-            logger.info(f"Found {total_videos} videos in playlist")
+            logger.info("Found %d videos in playlist", len(entries))
+            
+            # Entries are filtered lazily and pulled off as workers free up, so
+            # no filtered copy of the whole playlist is ever built. Videos an
+            # earlier, interrupted run already got through are skipped.
+            done_file = f"{output_file}.done"
+            done_ids = load_done_ids(done_file)
+            def is_pending(video):
+                return video and video_key(video) not in done_ids
+            
+            pending = filter(is_pending, entries)
+            total_videos = sum(1 for video in entries if is_pending(video))
+            if done_ids:
+                logger.info("Resuming: %d videos left to process", total_videos)
             
             # Create or append to CSV file
             file_exists = os.path.exists(output_file)
             mode = 'a' if file_exists else 'w'
             
-            # Process videos in parallel with smaller batches
-            batch_size = 50  # Process 50 videos at a time
+            # Enough queued work that a worker never waits for its next video
+            window_size = max_workers * 2
+            rate_limiter = RateLimiter(rate_limit)
             
-            for i in range(0, total_videos, batch_size):
-                batch = videos[i:i + batch_size]
-                logger.info(f"Processing batch {i//batch_size + 1}/{(total_videos + batch_size - 1)//batch_size}")
+            # The output files, the worker pool and the progress bar are set up
+            # once for the whole run; request pacing is left to the rate limiter.
+            with open(done_file, 'a') as done_log, \
+                    open(output_file, mode, newline='') as csv_file, \
+                    ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                    tqdm(total=total_videos, desc="Processing videos") as pbar:
+                writer = csv.writer(csv_file, quoting=csv.QUOTE_MINIMAL)
+                if not file_exists:
+                    writer.writerow(['Video Title', 'Video URL', 'Bandcamp Links'])
+                
+                # Rows and done IDs are held here and only written out together,
+                # CSV first, so neither file can get ahead of the other on its
+                # own: a video is never marked done before its row is on disk.
+                pending_rows = []
+                pending_done = []
+                
+                def flush_results():
+                    writer.writerows(pending_rows)
+                    csv_file.flush()
+                    done_log.writelines(f"{key}\n" for key in pending_done)
+                    done_log.flush()
+                    pending_rows.clear()
+                    pending_done.clear()
+                
+                # Keep a sliding window of videos in flight: each finished video
+                # is replaced straight away, so one slow video never leaves the
+                # other workers idle waiting for a batch to drain
+                in_flight = {
+                    executor.submit(extract_bandcamp_links, video, rate_limiter): video
+                    for video in islice(pending, window_size)
+                }
                 
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    futures = {
-                        executor.submit(extract_bandcamp_links, video['url']): video['url'] 
-                        for video in batch
-                    }
-                    
-                    # Create progress bar for this batch
-                    with tqdm(total=len(batch), desc="Processing videos") as pbar:
-                        for future in as_completed(futures):
+                try:
+                    while in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            video = in_flight.pop(future)
+                            next_video = next(pending, None)
+                            if next_video is not None:
+                                in_flight[executor.submit(extract_bandcamp_links, next_video, rate_limiter)] = next_video
+                            
                             try:
                                 result = future.result()
                                 processed_count += 1
                                 
                                 if result:
                                     found_count += 1
-                                    # Create DataFrame for this result
-                                    df = pd.DataFrame({
-                                        'Video Title': [result['video_title']],
-                                        'Video URL': [result['video_url']],
-                                        'Bandcamp Links': [', '.join(result['bandcamp_links'])]
-                                    })
-                                    
-                                    # Write to CSV immediately
-                                    df.to_csv(output_file, mode=mode, header=not file_exists, index=False)
-                                    file_exists = True  # After first write, we're appending
+                                    pending_rows.append([
+                                        result['video_title'],
+                                        result['video_url'],
+                                        ', '.join(result['bandcamp_links'])
+                                    ])
                                     
                                     # Log found links
-                                    logger.info(f"Found Bandcamp links in: {result['video_title']}")
+                                    logger.info("Found Bandcamp links in: %s", result['video_title'])
                                     for link in result['bandcamp_links']:
-                                        logger.info(f"  - {link}")
-                            except Exception:
+                                        logger.info("  - %s", link)
+                                
+                                pending_done.append(video_key(video))
+                            except Exception as e:
                                 error_count += 1
+                                logger.warning("Error processing %s: %s", video['url'], e)
+                                # Removed, private or blocked videos are marked done as
+                                # well so a resumed run doesn't fetch them again; only
+                                # rate limits and network failures are left to retry
+                                if is_permanent_error(e):
+                                    pending_done.append(video_key(video))
+                            
+                            if len(pending_done) >= FLUSH_EVERY:
+                                flush_results()
                             
                             # Update progress bar
                             pbar.update(1)
@@ -152,38 +453,53 @@ def process_playlist(playlist_url: str, output_file: str = None, max_workers: in
                                 'Found': found_count,
                                 'Errors': error_count
                             })
-                
-                # Add a small delay between batches to avoid rate limiting
-                if i + batch_size < total_videos:
-                    time.sleep(2)
+                except KeyboardInterrupt:
+                    # Drop videos that haven't started rather than fetching them
+                    # only to throw the results away; only running ones are awaited
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+                finally:
+                    # Also runs on Ctrl+C, before the files are closed
+                    flush_results()
             
-            logger.info(f"Processing complete.")
-            logger.info(f"Processed {processed_count} videos")
-            logger.info(f"Found Bandcamp links in {found_count} videos")
-            logger.info(f"Encountered {error_count} errors")
-            logger.info(f"Results saved to {output_file}")
+            logger.info("Processing complete.")
+            logger.info("Processed %d videos", processed_count)
+            logger.info("Found Bandcamp links in %d videos", found_count)
+            logger.info("Encountered %d errors", error_count)
+            logger.info("Results saved to %s", output_file)
             
     except KeyboardInterrupt:
         logger.info("\nScript interrupted by user. Progress has been saved.")
-        logger.info(f"Processed {processed_count} videos")
-        logger.info(f"Found Bandcamp links in {found_count} videos")
-        logger.info(f"Encountered {error_count} errors")
-        logger.info(f"Results saved to {output_file}")
+        logger.info("Processed %d videos", processed_count)
+        logger.info("Found Bandcamp links in %d videos", found_count)
+        logger.info("Encountered %d errors", error_count)
+        logger.info("Results saved to %s", output_file)
     except Exception as e:
-        logger.error(f"Error processing playlist: {str(e)}")
+        logger.error("Error processing playlist: %s", e)
+
+def positive_int(value: str):
+    """argparse type for options that must be a whole number above zero."""
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
 
 def main():
     parser = argparse.ArgumentParser(description='Extract Bandcamp links from YouTube playlist descriptions')
     parser.add_argument('playlist_url', help='YouTube playlist URL')
     parser.add_argument('--output', '-o', 
                         help='Output CSV file (default: auto-generated based on playlist ID)')
-    parser.add_argument('--workers', '-w', type=int, default=4,
-                        help='Number of worker threads (default: 4)')
+    parser.add_argument('--workers', '-w', type=positive_int,
+                        help='Number of worker threads (default: enough to keep up with '
+                             f'--rate-limit, {default_workers()} at the default rate)')
+    parser.add_argument('--rate-limit', '-r', type=positive_int, default=DEFAULT_RATE_LIMIT,
+                        help=f'Maximum video requests per minute (default: {DEFAULT_RATE_LIMIT})')
     
     args = parser.parse_args()
     
-    logger.info(f"Starting extraction from playlist: {args.playlist_url}")
-    process_playlist(args.playlist_url, args.output, args.workers)
+    setup_logging()
+    logger.info("Starting extraction from playlist: %s", args.playlist_url)
+    process_playlist(args.playlist_url, args.output, args.workers, args.rate_limit)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,46 @@
+import pytest
+
+from bandcamp_extractor import find_bandcamp_links
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Artist, album and track pages
+    ('https://avantgarderecords.bandcamp.com/', ['https://avantgarderecords.bandcamp.com/']),
+    ('https://artist.bandcamp.com', ['https://artist.bandcamp.com/']),
+    ('https://artist.bandcamp.com/album/my-lp', ['https://artist.bandcamp.com/album/my-lp']),
+    ('https://artist.bandcamp.com/track/song_1/', ['https://artist.bandcamp.com/track/song_1']),
+    # Scheme and host case are normalised
+    ('http://artist.bandcamp.com/album/my-lp', ['https://artist.bandcamp.com/album/my-lp']),
+    ('https://x.Bandcamp.com/track/y', ['https://x.bandcamp.com/track/y']),
+    ('HTTPS://Artist.BANDCAMP.COM/album/lp', ['https://artist.bandcamp.com/album/lp']),
+    # Ports, query strings, fragments and &-tails are dropped
+    ('https://a.bandcamp.com:443/album/x', ['https://a.bandcamp.com/album/x']),
+    ('https://a.bandcamp.com/album/x?from=yt', ['https://a.bandcamp.com/album/x']),
+    ('https://a.bandcamp.com/album/x#t', ['https://a.bandcamp.com/album/x']),
+    ('https://a.bandcamp.com/album/foo&utm_source=x', ['https://a.bandcamp.com/album/foo']),
+    # Punctuation around the link isn't part of it
+    ('Out now: https://a.bandcamp.com/album/x.', ['https://a.bandcamp.com/album/x']),
+    ('(https://a.bandcamp.com/track/y)', ['https://a.bandcamp.com/track/y']),
+    ('Support at https://z.bandcamp.com.', ['https://z.bandcamp.com/']),
+    # Other pages on an artist's site point back to the artist
+    ('https://a.bandcamp.com/music', ['https://a.bandcamp.com/']),
+    ('https://a.bandcamp.com/merch', ['https://a.bandcamp.com/']),
+    # Bandcamp's own pages and look-alike hosts aren't artists
+    ('https://www.bandcamp.com/', []),
+    ('https://daily.bandcamp.com/features/x', []),
+    ('http://artist.bandcamp.com.evil.io/', []),
+    ('https://bandcamp.com/artist', []),
+    ('no links here', []),
+])
+def test_find_bandcamp_links(text, expected):
+    assert find_bandcamp_links(text) == expected
+
+
+def test_find_bandcamp_links_drops_repeats_in_order():
+    text = ('https://b.bandcamp.com/album/x?from=yt '
+            'https://a.bandcamp.com/ '
+            'http://B.bandcamp.com/album/x')
+    assert find_bandcamp_links(text) == [
+        'https://b.bandcamp.com/album/x',
+        'https://a.bandcamp.com/',
+    ]